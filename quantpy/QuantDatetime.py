@@ -7,33 +7,116 @@
 from __future__ import annotations
 from typing import Literal, Callable
 from math import ceil
+from functools import lru_cache, wraps
+from sys import intern
+import numpy as np
 import QuantLib as ql
 
 
 __all__ = ["QuantDatetime", "comparable"]
 
 
-def _time_diff(end: QuantDatetime, start: QuantDatetime) -> float:
-  """Calculates the year fraction for an intraday difference. Does the calculations to the accuracy of seconds"""
-  return (end.hour - start.hour) / 8_760 + (end.minute - start.minute) / 525_600 + (end.second - start.second) / 31_536_000 
+# The year fractions of an hour, a minute and a second
+_YEARS_PER_HOUR   = 1. / 8_760
+_YEARS_PER_MINUTE = 1. / 525_600
+_YEARS_PER_SECOND = 1. / 31_536_000
+
+
+def _year_fraction(days: int, day_count: int, hours: int, minutes: int, seconds: int) -> float:
+  """Calculates the year fraction from a day difference and intraday differences. Does the calculations to the accuracy of seconds"""
+  return days / day_count + hours * _YEARS_PER_HOUR + minutes * _YEARS_PER_MINUTE + seconds * _YEARS_PER_SECOND
   
 
-# Map from the name of the calendar to the ql.Calendar object
+# Map from the name of the calendar to the function constructing the ql.Calendar object
 _calendar_map = {
-  "Eurex"     : ql.Germany(ql.Germany.Eurex),
-  "Frankfurt" : ql.Germany(ql.Germany.FrankfurtStockExchange),
-  "Xetra"     : ql.Germany(ql.Germany.Xetra),
-  "London"    : ql.UnitedKingdom(ql.UnitedKingdom.Exchange),
-  "NYSE"      : ql.UnitedStates(ql.UnitedStates.NYSE)
+  "Eurex"     : lambda: ql.Germany(ql.Germany.Eurex),
+  "Frankfurt" : lambda: ql.Germany(ql.Germany.FrankfurtStockExchange),
+  "Xetra"     : lambda: ql.Germany(ql.Germany.Xetra),
+  "London"    : lambda: ql.UnitedKingdom(ql.UnitedKingdom.Exchange),
+  "NYSE"      : lambda: ql.UnitedStates(ql.UnitedStates.NYSE)
 }
 
 
-# Map from the convention name to the function for calculating the time delta
+@lru_cache(maxsize=None)
+def _get_calendar(calendar_name: str) -> ql.Calendar:
+  """Constructs the ql.Calendar object for the given name on first use"""
+  return _calendar_map[calendar_name]()
+
+
+# The range of serial numbers supported by QuantLib
+_MIN_SERIAL = ql.Date.minDate().serialNumber()
+_MAX_SERIAL = ql.Date.maxDate().serialNumber()
+
+
+# The number of bits in the offset of a serial number within a bank day bitmap block (2^12 days i.e. roughly 11 years)
+_BLOCK_BITS = 12
+
+
+@lru_cache(maxsize=None)
+def _bank_day_bitmap(calendar_name: str, block: int) -> bytes:
+  """
+  @brief Builds a packed bitmap of the bank days in a block of serial numbers
+  @details The bit (offset & 7) of byte (offset >> 3) is set if the serial number (block << _BLOCK_BITS) + offset is a bank day. 
+  Serial numbers outside the range supported by QuantLib are marked as non-bank days
+  @param calendar_name  The name of the calendar
+  @param block          The index of the block i.e. the serial number shifted right by _BLOCK_BITS
+  @returns              The packed bitmap
+  """
+  calendar   = _get_calendar(calendar_name)
+  base       = block << _BLOCK_BITS
+  first      = max(base, _MIN_SERIAL)
+  last       = min(base + (1 << _BLOCK_BITS), _MAX_SERIAL + 1)
+  
+  bank_days = np.zeros(1 << _BLOCK_BITS, dtype=np.uint8)
+  
+  for serial in range(first, last):
+    bank_days[serial - base] = calendar.isBusinessDay(ql.Date(serial))
+    
+  return np.packbits(bank_days, bitorder="little").tobytes()
+
+
+def _is_bank_serial(calendar_name: str, serial: int) -> bool:
+  """Checks if the given QuantLib serial number is a bank day with a single bit test"""
+  offset = serial & ((1 << _BLOCK_BITS) - 1)
+  return bool((_bank_day_bitmap(calendar_name, serial >> _BLOCK_BITS)[offset >> 3] >> (offset & 7)) & 1)
+
+
+def _next_bank_serial(calendar_name: str, serial: int, step: int) -> int:
+  """Steps from the given QuantLib serial number in the direction of step until a bank day is found"""
+  serial += step
+  
+  while _MIN_SERIAL <= serial <= _MAX_SERIAL and not _is_bank_serial(calendar_name, serial):
+    serial += step
+    
+  if not _MIN_SERIAL <= serial <= _MAX_SERIAL:
+    raise RuntimeError(f"No bank day found within the dates supported by QuantLib! (serial number {serial} outside allowed range [{_MIN_SERIAL}-{_MAX_SERIAL}])")
+    
+  return serial
+
+
+@lru_cache(maxsize=None)
+def _bank_days(calendar_name: str, start_serial: int, end_serial: int) -> int:
+  """Counts the bank days between two QuantLib serial numbers by popcounting the bank day bitmaps. Inclusive from start but not end"""
+  bank_day_count = 0
+  
+  for block in range(start_serial >> _BLOCK_BITS, ((end_serial - 1) >> _BLOCK_BITS) + 1):
+    base  = block << _BLOCK_BITS
+    first = max(start_serial, base) - base
+    last  = min(end_serial, base + (1 << _BLOCK_BITS)) - base
+    
+    # Drop the bits before the first day of the first byte and after the last day of the last byte
+    bits = int.from_bytes(_bank_day_bitmap(calendar_name, block)[first >> 3:(last + 7) >> 3], "little") >> (first & 7)
+    bank_day_count += (bits & ((1 << (last - first)) - 1)).bit_count()
+    
+  return bank_day_count
+
+
+# Map from the convention name to the integer code used to dispatch the day count in 'QuantDatetime.timedelta'
 _convention_map = {
-  "30/360"       : lambda end, start: (360 * (end.year - start.year) + 30 * (end.month - start.month) + (end.day - start.day)) / 360 + _time_diff(end, start),
-  "ACT/365"      : lambda end, start: start.days_until(end) / 365 + _time_diff(end, start),
-  "ACT/360"      : lambda end, start: start.days_until(end) / 360 + _time_diff(end, start),
-  "Business/252" : lambda end, start: start.bank_days_until(end) / 252 + _time_diff(end, start)
+  "30/360"       : 0,
+  "ACT/365"      : 1,
+  "ACT/360"      : 2,
+  "Business/252" : 3
 }
 
 
@@ -46,16 +129,26 @@ _day_count_map = {
 }
 
 
+# The valid calendar and convention names
+_CALENDAR_NAMES   = tuple(_calendar_map)
+_CONVENTION_NAMES = tuple(_convention_map)
+
+
 def comparable(func: Callable[[QuantDatetime, QuantDatetime], any]) -> Callable:
   """
   @brief Decorator that asserts that two QfDate instances are comparable i.e. share the calendar and day count convention
+  @details The names are interned on construction so they can be compared by identity. As the checks are assertions 
+  the function is returned undecorated when running with optimizations (python -O)
   @param func  The function to be decorated
   @return      The decorated function
   """
+  if not __debug__:
+    return func
   
+  @wraps(func)
   def wrapper(this: QuantDatetime, that: QuantDatetime) -> None:
-    assert this.convention == that.convention, f"The conventions must match! ({this.convention} != {that.convention})"
-    assert this.calendar  == that.calendar, f"The calendars must match! ({this.calendar} != {that.calendar})"
+    assert this._QuantDatetime__convention_name is that._QuantDatetime__convention_name, f"The conventions must match! ({this.convention} != {that.convention})"
+    assert this._QuantDatetime__calendar_name is that._QuantDatetime__calendar_name, f"The calendars must match! ({this.calendar} != {that.calendar})"
     
     return func(this, that)
   
@@ -65,6 +158,11 @@ def comparable(func: Callable[[QuantDatetime, QuantDatetime], any]) -> Callable:
 class QuantDatetime:
   """Datetime object with calendar and day-count functionality"""
   
+  # The private names are mangled to '_QuantDatetime__<name>' like the attributes assigned in the methods
+  __slots__ = ("__year", "__month", "__day", "__hour", "__minute", "__second", "__millisecond", 
+               "__calendar_name", "__convention_name", "__convention_code", "__day_count", 
+               "__ql_date", "__serial_number", "__hash")
+  
   def __init__(self, year: int, month: int, day: int, 
                hour: int = 16, minute: int = 0, second: int = 0, millisecond: int = 0, 
                calendar: Literal["Eurex", "Frankfurt", "Xetra", "London", "NYSE"] = "Frankfurt", 
@@ -86,13 +184,13 @@ class QuantDatetime:
     
     assert (month > 0)        and (month < 13),         f"Month out of range! ({month} not between 1 and 12)"
     assert (day > 0)          and (day < 32),           f"Day out of range! ({day} not between 1 and 31)"
-    assert (hour >= 0)        and (hour < 25),           f"Hour out of range! ({hour} not between 0 and 23)"
+    assert (hour >= 0)        and (hour < 24),          f"Hour out of range! ({hour} not between 0 and 23)"
     assert (minute >= 0)      and (minute < 60),        f"Minute out of range! ({minute} not between 0 and 59)"
     assert (second >= 0)      and (second < 60),        f"Second out of range! ({second} not between 0 and 59)"
     assert (millisecond >= 0) and (millisecond < 1000), f"millisecond out of range! ({millisecond} not between 0 and 999)"
     
-    assert calendar in list(_calendar_map.keys()), f"Invalid calendar given! ({calendar} not in {list(_calendar_map.keys())})"
-    assert convention in list(_convention_map.keys()), f"Invalid day count convention given! ({convention} not in {list(_convention_map.keys())})"
+    assert calendar in _calendar_map, f"Invalid calendar given! ({calendar} not in {_CALENDAR_NAMES})"
+    assert convention in _convention_map, f"Invalid day count convention given! ({convention} not in {_CONVENTION_NAMES})"
     
     self.__year            = year
     self.__month           = month
@@ -102,10 +200,10 @@ class QuantDatetime:
     self.__second          = second
     self.__millisecond     = millisecond
     
-    self.__calendar_name   = calendar
-    self.__calendar        = _calendar_map[calendar]
-    self.__convention_name = convention
-    self.__convention      = _convention_map[convention]
+    self.__calendar_name   = intern(calendar)
+    self.__convention_name = intern(convention)
+    self.__convention_code = _convention_map[convention]
+    self.__day_count       = _day_count_map[convention]
     
     try:
       self.__ql_date = ql.Date(day, month, year)
@@ -113,6 +211,7 @@ class QuantDatetime:
       assert False, f"Couldn't construct date {self.__year}-{self.__month:02}-{self.__day:02}!"
       
     self.__serial_number = self.__ql_date.serialNumber()
+    self.__hash          = hash((self.__serial_number, self.__hour, self.__minute, self.__second, self.__millisecond, self.__calendar_name, self.__convention_name))
     
     
   def __str__(self) -> str:
@@ -125,46 +224,50 @@ class QuantDatetime:
     return f"Date: {self}\nConvention: {self.__convention_name}\nCalendar: {self.__calendar_name}"
 
 
-  def __hash__(self) -> str:
+  def __reduce__(self) -> tuple:
+    """Pickles the datetime as its constructor arguments, as the QuantLib objects cannot be pickled"""
+    return (QuantDatetime, (self.__year, self.__month, self.__day, self.__hour, self.__minute, self.__second, self.__millisecond, 
+                            self.__calendar_name, self.__convention_name))
+  
+  
+  def __hash__(self) -> int:
     """Hash for the datetime"""
-    return hash(repr(self))
+    return self.__hash
+  
+  
+  def __key(self) -> tuple:
+    """The datetime as a tuple ordered from the most to the least significant field"""
+    return (self.__serial_number, self.__hour, self.__minute, self.__second, self.__millisecond)
   
   
   @comparable
   def __eq__(self, other: QuantDatetime) -> bool:
     """Equality comparison operator"""
-    return (self.year == other.year) and (self.month == other.month) and (self.day == other.day) and \
-           (self.hour == other.hour) and (self.minute == other.minute) and (self.second == other.second) and (self.millisecond == other.millisecond)
+    return self.__key() == other.__key()
   
   
   @comparable
   def __gt__(self, other: QuantDatetime) -> bool:
     """Greater than comparison operator"""
-    return ((self.year == other.year) and (self.month == other.month) and (self.day == other.day) and (self.hour == other.hour) and (self.minute == other.minute) and (self.second == other.second) and (self.millisecond > other.millisecond)) or \
-           ((self.year == other.year) and (self.month == other.month) and (self.day == other.day) and (self.hour == other.hour) and (self.minute == other.minute) and (self.second > other.second)) or \
-           ((self.year == other.year) and (self.month == other.month) and (self.day == other.day) and (self.hour == other.hour) and (self.minute > other.minute)) or \
-           ((self.year == other.year) and (self.month == other.month) and (self.day == other.day) and (self.hour > other.hour)) or \
-           ((self.year == other.year) and (self.month == other.month) and (self.day > other.day)) or \
-           ((self.year == other.year) and (self.month > other.month)) or \
-           ((self.year > other.year)) 
+    return self.__key() > other.__key()
   
   
   @comparable
   def __lt__(self, other: QuantDatetime) -> bool:
     """Less than comparison operator"""
-    return not (self >= other)
+    return self.__key() < other.__key()
   
   
   @comparable
   def __ge__(self, other: QuantDatetime) -> bool:
     """Greater than or equal to comparison operator"""
-    return (self > other) or (self == other)
+    return self.__key() >= other.__key()
   
   
   @comparable
   def __le__(self, other: QuantDatetime) -> bool:
     """Less than or equal to comparison operator"""
-    return (self < other) or (self == other)
+    return self.__key() <= other.__key()
   
   
   @property
@@ -225,7 +328,8 @@ class QuantDatetime:
     """
     @brief Shifts the datetime by the specified amount of time
     @details Note that as months are not of constant length, shifting by some number of months is not a permitted operation
-    @param years         The year fraction by which the datetime is shifted (impacts the days only)
+    @param years         The year fraction by which the datetime is shifted (impacts the days only). Whole years are shifted by calendar 
+                         years (respecting leap years), other fractions by round(years * 365) days
     @param days          The number of days by which the datetime is shifted
     @param hours         The number of hours by which the datetime is shifted
     @param minutes       The number of minutes by which the datetime is shifted
@@ -233,20 +337,37 @@ class QuantDatetime:
     @param milliseconds  The number of milliseconds by which the datetime is shifted
     @returns             A 'QuantDatetime' object shifted by the specified amount
     """
-    new_millisecond = (self.millisecond + milliseconds) % 1000
-    millisecond_res = (self.millisecond + milliseconds) // 1000
-    new_second      = (self.second + seconds + millisecond_res) % 60
-    second_res      = (self.second + seconds + millisecond_res) // 60
-    new_minute      = (self.minute + minutes + second_res) % 60
-    minute_res      = (self.minute + minutes + second_res) // 60
-    new_hour        = (self.hour + hours + minute_res) % 24
-    hour_res        = (self.hour + hours + minute_res) // 24
-    day_shift       = days + hour_res + round(years * 365)
+    millisecond_res, new_millisecond = divmod(self.__millisecond + milliseconds, 1000)
+    second_res, new_second           = divmod(self.__second + seconds + millisecond_res, 60)
+    minute_res, new_minute           = divmod(self.__minute + minutes + second_res, 60)
+    hour_res, new_hour               = divmod(self.__hour + hours + minute_res, 24)
+    day_shift                        = days + hour_res
+    serial_number                    = self.__serial_number
     
-    new_ql_date = ql.Date(self.__serial_number + day_shift)
+    if years != 0 and float(years).is_integer():
+      serial_number = (self.__ql_date + ql.Period(int(years), ql.Years)).serialNumber()
+    else:
+      day_shift += round(years * 365)
     
-    return QuantDatetime(new_ql_date.year(), new_ql_date.month(), new_ql_date.dayOfMonth(), 
-                         hour = new_hour, minute = new_minute, second = new_second, millisecond = new_millisecond, 
+    return self.__from_ql_date(ql.Date(serial_number + day_shift), 
+                               hour = new_hour, minute = new_minute, second = new_second, millisecond = new_millisecond)
+  
+  
+  def __from_ql_date(self, ql_date: ql.Date, hour: int = None, minute: int = None, second: int = None, millisecond: int = None) -> QuantDatetime:
+    """
+    @brief Constructs a datetime from a QuantLib date sharing the calendar and convention of this datetime
+    @param ql_date      The QuantLib date
+    @param hour         The hour of the new datetime. Defaults to the hour of this datetime
+    @param minute       The minute of the new datetime. Defaults to the minute of this datetime
+    @param second       The second of the new datetime. Defaults to the second of this datetime
+    @param millisecond  The millisecond of the new datetime. Defaults to the millisecond of this datetime
+    @returns            The constructed 'QuantDatetime' object
+    """
+    return QuantDatetime(ql_date.year(), ql_date.month(), ql_date.dayOfMonth(), 
+                         hour = self.__hour if hour is None else hour, 
+                         minute = self.__minute if minute is None else minute, 
+                         second = self.__second if second is None else second, 
+                         millisecond = self.__millisecond if millisecond is None else millisecond, 
                          calendar=self.__calendar_name, convention=self.__convention_name)
   
   
@@ -258,9 +379,17 @@ class QuantDatetime:
     @returns           The year fraction
     """
     if self > other_date:
-      return -self.__convention(self, other_date)
+      return -other_date.timedelta(self)
+    
+    if self.__convention_code == 0:    # 30/360
+      days = 360 * (other_date.__year - self.__year) + 30 * (other_date.__month - self.__month) + (other_date.__day - self.__day)
+    elif self.__convention_code == 3:  # Business/252
+      days = _bank_days(self.__calendar_name, self.__serial_number, other_date.__serial_number)
+    else:                              # ACT/365 and ACT/360
+      days = other_date.__serial_number - self.__serial_number
     
-    return self.__convention(other_date, self)
+    return _year_fraction(days, self.__day_count, 
+                          other_date.__hour - self.__hour, other_date.__minute - self.__minute, other_date.__second - self.__second)
   
   
   @comparable
@@ -294,19 +423,7 @@ class QuantDatetime:
     @returns           The number of bank days
     """
     assert self <= other_date, f"The given date cannot be less than the instance date! ({self} < {other_date})"
-    
-    bank_day_count = 0
-    
-    if self.is_bank_date():
-      bank_day_count += 1
-      
-    date = self.next_bank_date()
-    
-    while date < other_date:
-      bank_day_count += 1
-      date = date.next_bank_date()
-      
-    return bank_day_count
+    return _bank_days(self.__calendar_name, self.__serial_number, other_date.__serial_number)
   
 
   @comparable
@@ -326,33 +443,23 @@ class QuantDatetime:
     @brief Checks if this date is a bank day
     @returns  True if this day is bank day False otherwise
     """
-    return self.__calendar.isBusinessDay(self.__ql_date)
+    return _is_bank_serial(self.__calendar_name, self.__serial_number)
   
   
   def next_bank_date(self) -> QuantDatetime:
     """
-    @brief Iterates until the next bank day is found
+    @brief Finds the next bank day
     @returns  The next bank day
     """
-    next_date = self.shift(days=1)
-    
-    while not next_date.is_bank_date():
-      next_date = next_date.shift(days=1)
-      
-    return next_date
+    return self.__from_ql_date(ql.Date(_next_bank_serial(self.__calendar_name, self.__serial_number, 1)))
   
   
   def prev_bank_date(self) -> QuantDatetime:
     """
-    @brief Iterates until the last bank day is found
+    @brief Finds the last bank day
     @returns  The lastt bank day
     """
-    prev_date = self.shift(days=-1)
-    
-    while not prev_date.is_bank_date():
-      prev_date = prev_date.shift(days=-1)
-      
-    return prev_date
+    return self.__from_ql_date(ql.Date(_next_bank_serial(self.__calendar_name, self.__serial_number, -1)))
   
   
   def is_month_end(self) -> bool:
@@ -360,40 +467,29 @@ class QuantDatetime:
     @brief Checks if the date is a month end
     @returns  True if this day is month end False otherwise
     """
-    next_date = self.shift(days=1)
-    
-    return next_date.month != self.month
+    return ql.Date.isEndOfMonth(self.__ql_date)
     
     
   def next_month_end(self) -> QuantDatetime:
     """
-    @brief Iterates until the next month end is found. 
+    @brief Finds the next month end
     @details If this date is month end returns self
     @returns The next month end
     """
     if self.is_month_end():
       return self
     
-    next_date = self.shift(days=1)
-    
-    while next_date.month == self.month:
-      next_date = next_date.shift(days=1)
-      
-    return next_date.shift(days=-1)
+    return self.__from_ql_date(ql.Date.endOfMonth(self.__ql_date))
   
   
   def prev_month_end(self) -> QuantDatetime:
     """
-    @brief Iterates until the last month end is found. 
+    @brief Finds the last month end
     @details If this date is month end returns self
     @returns The last month end
     """
     if self.is_month_end():
       return self
     
-    prev_date = self.shift(days=-1)
-    
-    while prev_date.month == self.month:
-      prev_date = prev_date.shift(days=-1)
-      
-    return prev_date
+    # The day of month counted back from the serial number lands on the last day of the previous month
+    return self.__from_ql_date(ql.Date(self.__serial_number - self.__day))
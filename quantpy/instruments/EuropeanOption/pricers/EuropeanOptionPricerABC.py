@@ -6,9 +6,13 @@
 """
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from functools import total_ordering
 from typing import List, Dict, Callable
 
+import numpy as np
 
+
+@total_ordering
 class EuropeanOptionPricerABC(ABC):
   """Abstract base class for European option pricers"""
   
@@ -39,29 +43,29 @@ class EuropeanOptionPricerABC(ABC):
     pass
   
   
-  def __ge__(self, other: EuropeanOptionPricerABC) -> bool:
-    """Greater than or equal to comparison"""
-    return repr(self) >= repr(other)
-  
-  
-  def __le__(self, other: EuropeanOptionPricerABC) -> bool:
-    """Less than or equal to comparison"""
-    return repr(self) <= repr(other)
-  
-  
-  def __gt__(self, other: EuropeanOptionPricerABC) -> bool:
-    """Greater than comparison"""
-    return repr(self) > repr(other)
+  def _sort_key(self) -> tuple:
+    """
+    @brief The key by which pricers are ordered and compared
+    @details Subclasses with additional model parameters should extend the key with them
+    @returns  The tuple of the volatility, risk-free rate and the name of the pricer class
+    """
+    return (self.volatility, self.risk_free_rate, type(self).__name__)
   
   
   def __lt__(self, other: EuropeanOptionPricerABC) -> bool:
     """Less than comparison"""
-    return repr(self) < repr(other)
+    if not isinstance(other, EuropeanOptionPricerABC):
+      return NotImplemented
+    
+    return self._sort_key() < other._sort_key()
   
   
   def __eq__(self, other: EuropeanOptionPricerABC) -> bool:
     """Equality comparison"""
-    return repr(self) == repr(other)
+    if not isinstance(other, EuropeanOptionPricerABC):
+      return NotImplemented
+    
+    return self._sort_key() == other._sort_key()
   
   
   @property
@@ -140,4 +144,86 @@ class EuropeanOptionPricerABC(ABC):
     @param **kwargs          Additional class specific keyword arguments
     @returns                 The theta of the European option
     """
-    pass
\ No newline at end of file
+    pass
+  
+  
+  def _batch(self, greek: Callable[..., float], underlying_values: np.ndarray, times_to_maturity: np.ndarray, 
+             *args: List[any], **kwargs: Dict[any, any]) -> np.ndarray:
+    """
+    @brief Evaluates a scalar method over broadcasted arrays of underlying values and times to maturity
+    @param greek              The scalar method to evaluate
+    @param underlying_values  The market prices of the underlying security
+    @param times_to_maturity  The times to maturity in years
+    @param *args              Additional class specific arguments
+    @param **kwargs           Additional class specific keyword arguments
+    @returns                  The values in an array of the broadcasted shape
+    """
+    underlying_values, times_to_maturity = np.broadcast_arrays(np.asarray(underlying_values, dtype=float), np.asarray(times_to_maturity, dtype=float))
+    values = [greek(underlying_value, time_to_maturity, *args, **kwargs) for underlying_value, time_to_maturity in zip(underlying_values.flat, times_to_maturity.flat)]
+    
+    return np.array(values, dtype=float).reshape(underlying_values.shape)
+  
+  
+  def delta_batch(self, underlying_values: np.ndarray, times_to_maturity: np.ndarray, *args: List[any], **kwargs: Dict[any, any]) -> np.ndarray:
+    """
+    @brief The option delta over arrays of underlying values and times to maturity
+    @details The default implementation loops over 'delta'. Subclasses with a closed form should override this with a vectorized expression
+    @param underlying_values  The market prices of the underlying security
+    @param times_to_maturity  The times to maturity in years. Broadcasted against the underlying values
+    @param *args              Additional class specific arguments
+    @param **kwargs           Additional class specific keyword arguments
+    @returns                  The deltas of the European option
+    """
+    return self._batch(self.delta, underlying_values, times_to_maturity, *args, **kwargs)
+  
+  
+  def gamma_batch(self, underlying_values: np.ndarray, times_to_maturity: np.ndarray, *args: List[any], **kwargs: Dict[any, any]) -> np.ndarray:
+    """
+    @brief The option gamma over arrays of underlying values and times to maturity
+    @details The default implementation loops over 'gamma'. Subclasses with a closed form should override this with a vectorized expression
+    @param underlying_values  The market prices of the underlying security
+    @param times_to_maturity  The times to maturity in years. Broadcasted against the underlying values
+    @param *args              Additional class specific arguments
+    @param **kwargs           Additional class specific keyword arguments
+    @returns                  The gammas of the European option
+    """
+    return self._batch(self.gamma, underlying_values, times_to_maturity, *args, **kwargs)
+  
+  
+  def vega_batch(self, underlying_values: np.ndarray, times_to_maturity: np.ndarray, *args: List[any], **kwargs: Dict[any, any]) -> np.ndarray:
+    """
+    @brief The option vega over arrays of underlying values and times to maturity
+    @details The default implementation loops over 'vega'. Subclasses with a closed form should override this with a vectorized expression
+    @param underlying_values  The market prices of the underlying security
+    @param times_to_maturity  The times to maturity in years. Broadcasted against the underlying values
+    @param *args              Additional class specific arguments
+    @param **kwargs           Additional class specific keyword arguments
+    @returns                  The vegas of the European option
+    """
+    return self._batch(self.vega, underlying_values, times_to_maturity, *args, **kwargs)
+  
+  
+  def rho_batch(self, underlying_values: np.ndarray, times_to_maturity: np.ndarray, *args: List[any], **kwargs: Dict[any, any]) -> np.ndarray:
+    """
+    @brief The option rho over arrays of underlying values and times to maturity
+    @details The default implementation loops over 'rho'. Subclasses with a closed form should override this with a vectorized expression
+    @param underlying_values  The market prices of the underlying security
+    @param times_to_maturity  The times to maturity in years. Broadcasted against the underlying values
+    @param *args              Additional class specific arguments
+    @param **kwargs           Additional class specific keyword arguments
+    @returns                  The rhos of the European option
+    """
+    return self._batch(self.rho, underlying_values, times_to_maturity, *args, **kwargs)
+  
+  
+  def theta_batch(self, underlying_values: np.ndarray, times_to_maturity: np.ndarray, *args: List[any], **kwargs: Dict[any, any]) -> np.ndarray:
+    """
+    @brief The option theta over arrays of underlying values and times to maturity
+    @details The default implementation loops over 'theta'. Subclasses with a closed form should override this with a vectorized expression
+    @param underlying_values  The market prices of the underlying security
+    @param times_to_maturity  The times to maturity in years. Broadcasted against the underlying values
+    @param *args              Additional class specific arguments
+    @param **kwargs           Additional class specific keyword arguments
+    @returns                  The thetas of the European option
+    """
+    return self._batch(self.theta, underlying_values, times_to_maturity, *args, **kwargs)
\ No newline at end of file